@@ -1,16 +1,42 @@
 import logging
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from enum import IntEnum
 from pathlib import Path
-from socket import IPPROTO_TCP, TCP_NODELAY, socket
-from threading import Thread
-from typing import Optional
+from selectors import EVENT_READ, DefaultSelector
+from socket import (
+    IPPROTO_TCP,
+    SO_RCVBUF,
+    SO_SNDBUF,
+    SOL_SOCKET,
+    TCP_NODELAY,
+    socket,
+)
+from struct import Struct
+from threading import Event, Lock, Thread, get_ident
+from typing import Any, Optional
 
 from rlbot import flat
 from rlbot.utils.logging import get_logger
 
+try:
+    from socket import TCP_QUICKACK  # type: ignore
+except ImportError:
+    # Only available on Linux
+    TCP_QUICKACK = None
+
 MAX_SIZE_2_BYTES = 2**16 - 1
+# Size of the reusable receive buffer, which must be able to hold the largest possible message
+RECV_BUFFER_SIZE = 2**17
+# Size of the kernel's send and receive buffers for the socket,
+# large enough to hold several ball predictions or render groups
+SOCKET_BUFFER_SIZE = 2**20
+# Every message starts with its type and size as two big-endian unsigned shorts
+MESSAGE_HEADER = Struct(">HH")
+# Bounds of the exponential backoff between connection attempts, in seconds
+MIN_CONNECT_RETRY_DELAY = 0.001
+MAX_CONNECT_RETRY_DELAY = 0.1
 # The default IP to connect to RLBotServer on
 RLBOT_SERVER_IP = "127.0.0.1"
 # The default port we can expect RLBotServer to be listening on
@@ -41,11 +67,24 @@ class SocketDataType(IntEnum):
     CONTROLLABLE_TEAM_INFO = 15
 
 
+# Types of messages that describe the current state of the game, so only the newest one is of interest
+LATEST_ONLY_TYPES = frozenset(
+    (SocketDataType.GAME_PACKET, SocketDataType.BALL_PREDICTION)
+)
+
+
 class SocketMessage:
+    __slots__ = ("type_int", "data")
+
     def __init__(self, type: int, data: bytes):
-        self.type = SocketDataType(type)
+        self.type_int = type
         self.data = data
 
+    @property
+    def type(self) -> SocketDataType:
+        # Built on demand since the hot paths only need the raw integer
+        return SocketDataType(self.type_int)
+
 
 class SocketRelay:
     """
@@ -56,20 +95,32 @@ class SocketRelay:
     from `rlbot.managers`.
     """
 
-    is_connected = False
-    _running = False
-    """Indicates whether a messages are being handled by the `run` loop (potentially in a background thread)"""
-
-    on_connect_handlers: list[Callable[[], None]] = []
-    packet_handlers: list[Callable[[flat.GamePacket], None]] = []
-    field_info_handlers: list[Callable[[flat.FieldInfo], None]] = []
-    match_settings_handlers: list[Callable[[flat.MatchSettings], None]] = []
-    match_communication_handlers: list[Callable[[flat.MatchComm], None]] = []
-    ball_prediction_handlers: list[Callable[[flat.BallPrediction], None]] = []
-    controllable_team_info_handlers: list[
-        Callable[[flat.ControllableTeamInfo], None]
-    ] = []
-    raw_handlers: list[Callable[[SocketMessage], None]] = []
+    __slots__ = (
+        "agent_id",
+        "connection_timeout",
+        "logger",
+        "is_connected",
+        "_running",
+        "_stopped",
+        "on_connect_handlers",
+        "packet_handlers",
+        "field_info_handlers",
+        "match_settings_handlers",
+        "match_communication_handlers",
+        "ball_prediction_handlers",
+        "controllable_team_info_handlers",
+        "raw_handlers",
+        "_dispatch_table",
+        "socket",
+        "_selector",
+        "_recv_buffer",
+        "_recv_view",
+        "_recv_start",
+        "_recv_end",
+        "_send_buffer",
+        "_batch_thread",
+        "_send_lock",
+    )
 
     def __init__(
         self,
@@ -81,36 +132,148 @@ class SocketRelay:
         self.connection_timeout = connection_timeout
         self.logger = get_logger("interface") if logger is None else logger
 
+        self.is_connected = False
+        self._running = False
+        """Indicates whether a messages are being handled by the `run` loop (potentially in a background thread)"""
+        # Set whenever the `run` loop is not running, so `disconnect` can wait for it to stop
+        self._stopped = Event()
+        self._stopped.set()
+
+        # Each relay needs its own handler lists, class level lists would be shared by all of them
+        self.on_connect_handlers: list[Callable[[], None]] = []
+        self.packet_handlers: list[Callable[[flat.GamePacket], None]] = []
+        self.field_info_handlers: list[Callable[[flat.FieldInfo], None]] = []
+        self.match_settings_handlers: list[Callable[[flat.MatchSettings], None]] = []
+        self.match_communication_handlers: list[Callable[[flat.MatchComm], None]] = []
+        self.ball_prediction_handlers: list[Callable[[flat.BallPrediction], None]] = []
+        self.controllable_team_info_handlers: list[
+            Callable[[flat.ControllableTeamInfo], None]
+        ] = []
+        self.raw_handlers: list[Callable[[SocketMessage], None]] = []
+
+        # The unpack function and handlers of each message type, indexed by the type's value
+        self._dispatch_table: list[
+            Optional[tuple[Callable[[bytes], Any], list[Callable[[Any], None]]]]
+        ] = [None] * len(SocketDataType)
+        for data_type, unpack, handlers in (
+            (SocketDataType.GAME_PACKET, flat.GamePacket.unpack, self.packet_handlers),
+            (
+                SocketDataType.FIELD_INFO,
+                flat.FieldInfo.unpack,
+                self.field_info_handlers,
+            ),
+            (
+                SocketDataType.MATCH_SETTINGS,
+                flat.MatchSettings.unpack,
+                self.match_settings_handlers,
+            ),
+            (
+                SocketDataType.MATCH_COMMUNICATION,
+                flat.MatchComm.unpack,
+                self.match_communication_handlers,
+            ),
+            (
+                SocketDataType.BALL_PREDICTION,
+                flat.BallPrediction.unpack,
+                self.ball_prediction_handlers,
+            ),
+            (
+                SocketDataType.CONTROLLABLE_TEAM_INFO,
+                flat.ControllableTeamInfo.unpack,
+                self.controllable_team_info_handlers,
+            ),
+        ):
+            self._dispatch_table[data_type] = (unpack, handlers)
+
         self.socket = socket()
+        # Used to check whether data is ready without switching the socket to non-blocking mode
+        self._selector = DefaultSelector()
+        self._recv_buffer = bytearray(RECV_BUFFER_SIZE)
+        self._recv_view = memoryview(self._recv_buffer)
+        # Received but not yet consumed data is in `_recv_buffer[_recv_start:_recv_end]`
+        self._recv_start = 0
+        self._recv_end = 0
+        # Outgoing messages of the thread that called `begin_batch` are collected here until `end_batch`
+        self._send_buffer: Optional[bytearray] = None
+        self._batch_thread: Optional[int] = None
+        # Keeps messages sent from different threads from being interleaved or lost
+        self._send_lock = Lock()
 
         # Allow sending packets before getting a response from core
         self.socket.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+        # Set before connecting so the TCP window can be scaled accordingly
+        self.socket.setsockopt(SOL_SOCKET, SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        self.socket.setsockopt(SOL_SOCKET, SO_SNDBUF, SOCKET_BUFFER_SIZE)
 
     def __del__(self):
+        self._selector.close()
         self.socket.close()
 
-    @staticmethod
-    def _int_to_bytes(val: int) -> bytes:
-        return val.to_bytes(2, byteorder="big")
-
-    def _read_int(self) -> int:
-        return int.from_bytes(self._read_exact(2), "big")
+    def _fill_buffer(self, n: int):
+        """
+        Reads from the socket until at least `n` bytes are buffered.
+        """
+        available = self._recv_end - self._recv_start
+        if available >= n:
+            return
 
-    def _read_exact(self, n: int) -> bytes:
-        buff = bytearray(n)
-        pos = 0
-        while pos < n:
-            cr = self.socket.recv_into(memoryview(buff)[pos:])
-            if cr == 0:
+        if self._recv_start + n > RECV_BUFFER_SIZE:
+            # Not enough room left at the end, move the unconsumed data to the front
+            self._recv_buffer[:available] = self._recv_view[
+                self._recv_start : self._recv_end
+            ].tobytes()
+            self._recv_start = 0
+            self._recv_end = available
+
+        while self._recv_end - self._recv_start < n:
+            # Ask for as much as fits, usually pulling in several messages with a single syscall
+            received = self.socket.recv_into(self._recv_view[self._recv_end :])
+            if received == 0:
                 raise EOFError
-            pos += cr
-        return bytes(buff)
+            self._recv_end += received
+
+    def _read_header(self) -> tuple[int, int]:
+        """
+        Returns the type and size of the next message without consuming it.
+        """
+        self._fill_buffer(MESSAGE_HEADER.size)
+        return MESSAGE_HEADER.unpack_from(self._recv_buffer, self._recv_start)
+
+    def _consume_message(self, size: int) -> tuple[int, int]:
+        """
+        Reads the rest of the next message, whose payload has the given size, and consumes it.
+        Returns where its payload is in the buffer, which stays valid until the next read.
+        """
+        self._fill_buffer(MESSAGE_HEADER.size + size)
+        start = self._recv_start + MESSAGE_HEADER.size
+        end = start + size
+
+        if end == self._recv_end:
+            # Everything has been consumed, start from the front again
+            self._recv_start = self._recv_end = 0
+        else:
+            self._recv_start = end
+
+        return start, end
+
+    def _is_ignored(self, type_int: int) -> bool:
+        """
+        Whether no handler is interested in messages of the given type,
+        in which case they don't have to be copied out of the buffer at all.
+        """
+        if self.raw_handlers or type_int == SocketDataType.NONE:
+            return False
+        if type_int >= len(self._dispatch_table):
+            return True
+        dispatch = self._dispatch_table[type_int]
+        return dispatch is None or not dispatch[1]
 
     def read_message(self) -> SocketMessage:
-        type_int = self._read_int()
-        size = self._read_int()
-        data = self._read_exact(size)
-        return SocketMessage(type_int, data)
+        type_int, size = self._read_header()
+        start, end = self._consume_message(size)
+        # The flatbuffers need their own copy as `bytes`,
+        # since the buffer will be overwritten by later messages
+        return SocketMessage(type_int, self._recv_view[start:end].tobytes())
 
     def send_bytes(self, data: bytes, data_type: SocketDataType):
         assert self.is_connected, "Connection has not been established"
@@ -122,8 +285,50 @@ class SocketRelay:
             )
             return
 
-        message = self._int_to_bytes(data_type) + self._int_to_bytes(size) + data
-        self.socket.sendall(message)
+        with self._send_lock:
+            if self._send_buffer is not None and self._batch_thread == get_ident():
+                self._send_buffer += MESSAGE_HEADER.pack(data_type, size)
+                self._send_buffer += data
+            else:
+                self.socket.sendall(MESSAGE_HEADER.pack(data_type, size) + data)
+
+    def begin_batch(self):
+        """
+        Collects all messages sent from the calling thread from now on,
+        until `end_batch` sends them with a single write.
+        Messages sent from other threads in the meantime are still sent immediately.
+        Only one thread can batch at a time, if another thread already is, this does nothing.
+        """
+        with self._send_lock:
+            if self._send_buffer is None:
+                self._send_buffer = bytearray()
+                self._batch_thread = get_ident()
+
+    def end_batch(self):
+        """
+        Sends the messages collected since `begin_batch` and goes back to sending messages immediately.
+        Does nothing if the calling thread isn't the one batching.
+        """
+        with self._send_lock:
+            if self._batch_thread != get_ident():
+                return
+
+            buffer, self._send_buffer = self._send_buffer, None
+            self._batch_thread = None
+            if buffer:
+                self.socket.sendall(buffer)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Sends all messages sent from the calling thread inside the `with` block with a single write,
+        see `begin_batch` and `end_batch`.
+        """
+        self.begin_batch()
+        try:
+            yield
+        finally:
+            self.end_batch()
 
     def send_init_complete(self):
         self.send_bytes(bytes(), SocketDataType.INIT_COMPLETE)
@@ -192,15 +397,16 @@ class SocketRelay:
         try:
             begin_time = time.time()
             next_warning = 10
+            # Retry quickly at first, since the server is often just about to start listening
+            retry_delay = MIN_CONNECT_RETRY_DELAY
             while time.time() < begin_time + self.connection_timeout:
                 try:
                     self.socket.connect((rlbot_server_ip, rlbot_server_port))
                     self.is_connected = True
                     break
-                except ConnectionRefusedError:
-                    time.sleep(0.1)
-                except ConnectionAbortedError:
-                    time.sleep(0.1)
+                except (ConnectionRefusedError, ConnectionAbortedError):
+                    time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, MAX_CONNECT_RETRY_DELAY)
                 if time.time() > begin_time + next_warning:
                     next_warning *= 2
                     self.logger.warning(
@@ -221,6 +427,15 @@ class SocketRelay:
         finally:
             self.socket.settimeout(None)
 
+        self._selector.register(self.socket, EVENT_READ)
+
+        if TCP_QUICKACK is not None:
+            # Don't let delayed ACKs hold up the initial exchange with core
+            try:
+                self.socket.setsockopt(IPPROTO_TCP, TCP_QUICKACK, 1)
+            except OSError:
+                pass
+
         self.logger.info(
             "SocketRelay connected to port %s from port %s!",
             rlbot_server_port,
@@ -249,43 +464,94 @@ class SocketRelay:
             Thread(target=self.run).start()
         else:
             self._running = True
-            while self._running and self.is_connected:
-                self._running = self.handle_incoming_messages(blocking=True)
-            self._running = False
+            self._stopped.clear()
+            try:
+                while self._running and self.is_connected:
+                    self._running = self.handle_incoming_messages(blocking=True)
+            finally:
+                self._running = False
+                self._stopped.set()
 
     def handle_incoming_messages(self, blocking: bool = False) -> bool:
         """
         Empties queue of incoming messages (should be called regularly, see `run`).
-        Optionally blocking, ensuring that at least one message will be handled.
+        Optionally blocking, ensuring that at least one message will be read.
+        Messages without any handlers are discarded unhandled, so this can return without handling anything.
+        If several messages of a type in `LATEST_ONLY_TYPES` are queued, only the newest is handled,
+        unless there are raw handlers.
         Returns true message handling should continue running, and
         false if RLBotServer has asked us to shut down or an error happened.
         """
         assert self.is_connected, "Connection has not been established"
+
+        # Looked up once, since the loop below may run for many messages
+        select = self._selector.select
+        read_header = self._read_header
+        consume_message = self._consume_message
+        is_ignored = self._is_ignored
+        read_message = self.read_message
+        try_handle_message = self._try_handle_message
+        recv_view = self._recv_view
+
+        # The payload of the newest queued message of each type in `LATEST_ONLY_TYPES`.
+        # These are handled once the queue is empty or when a message of another type arrives.
+        pending: dict[int, bytes] = {}
+
         try:
-            self.socket.setblocking(blocking)
-            incoming_message = self.read_message()
-            try:
-                return self.handle_incoming_message(incoming_message)
-            except flat.InvalidFlatbuffer as e:
-                self.logger.error(
-                    "Error while unpacking message of type %s (%s bytes): %s",
-                    incoming_message.type.name,
-                    len(incoming_message.data),
-                    e,
-                )
-                return False
-            except Exception as e:
-                self.logger.error(
-                    "Unexpected error while handling message of type %s: %s",
-                    incoming_message.type.name,
-                    e,
-                )
+            if not blocking and self._recv_start == self._recv_end and not select(0):
+                # No incoming messages
+                return True
+
+            while True:
+                type_int, size = read_header()
+                if is_ignored(type_int):
+                    consume_message(size)
+                elif type_int in LATEST_ONLY_TYPES and not self.raw_handlers:
+                    start, end = consume_message(size)
+                    # Reinserted to keep the pending messages in the order they arrived in
+                    pending.pop(type_int, None)
+                    pending[type_int] = recv_view[start:end].tobytes()
+                else:
+                    if pending and not self._handle_pending(pending):
+                        return False
+                    if not try_handle_message(read_message()):
+                        return False
+
+                if self._recv_start == self._recv_end and not select(0):
+                    # The queue is empty
+                    return not pending or self._handle_pending(pending)
+        except (OSError, EOFError) as e:
+            self.logger.error("SocketRelay disconnected unexpectedly! %s", e)
+            return False
+
+    def _handle_pending(self, pending: dict[int, bytes]) -> bool:
+        for type_int, data in pending.items():
+            if not self._try_handle_message(SocketMessage(type_int, data)):
                 return False
-        except BlockingIOError:
-            # No incoming messages and blocking==False
-            return True
-        except:
-            self.logger.error("SocketRelay disconnected unexpectedly!")
+
+        pending.clear()
+        return True
+
+    def _try_handle_message(self, incoming_message: SocketMessage) -> bool:
+        """
+        Like `handle_incoming_message`, but logs errors and returns False instead of raising them.
+        """
+        try:
+            return self.handle_incoming_message(incoming_message)
+        except flat.InvalidFlatbuffer as e:
+            self.logger.error(
+                "Error while unpacking message of type %s (%s bytes): %s",
+                incoming_message.type_int,
+                len(incoming_message.data),
+                e,
+            )
+            return False
+        except Exception as e:
+            self.logger.error(
+                "Unexpected error while handling message of type %s: %s",
+                incoming_message.type_int,
+                e,
+            )
             return False
 
     def handle_incoming_message(self, incoming_message: SocketMessage):
@@ -297,43 +563,22 @@ class SocketRelay:
         for raw_handler in self.raw_handlers:
             raw_handler(incoming_message)
 
-        match incoming_message.type:
-            case SocketDataType.NONE:
-                return False
-            case SocketDataType.GAME_PACKET:
-                if len(self.packet_handlers) > 0:
-                    packet = flat.GamePacket.unpack(incoming_message.data)
-                    for handler in self.packet_handlers:
-                        handler(packet)
-            case SocketDataType.FIELD_INFO:
-                if len(self.field_info_handlers) > 0:
-                    field_info = flat.FieldInfo.unpack(incoming_message.data)
-                    for handler in self.field_info_handlers:
-                        handler(field_info)
-            case SocketDataType.MATCH_SETTINGS:
-                if len(self.match_settings_handlers) > 0:
-                    match_settings = flat.MatchSettings.unpack(incoming_message.data)
-                    for handler in self.match_settings_handlers:
-                        handler(match_settings)
-            case SocketDataType.MATCH_COMMUNICATION:
-                if len(self.match_communication_handlers) > 0:
-                    match_comm = flat.MatchComm.unpack(incoming_message.data)
-                    for handler in self.match_communication_handlers:
-                        handler(match_comm)
-            case SocketDataType.BALL_PREDICTION:
-                if len(self.ball_prediction_handlers) > 0:
-                    ball_prediction = flat.BallPrediction.unpack(incoming_message.data)
-                    for handler in self.ball_prediction_handlers:
-                        handler(ball_prediction)
-            case SocketDataType.CONTROLLABLE_TEAM_INFO:
-                if len(self.controllable_team_info_handlers) > 0:
-                    player_mappings = flat.ControllableTeamInfo.unpack(
-                        incoming_message.data
-                    )
-                    for handler in self.controllable_team_info_handlers:
-                        handler(player_mappings)
-            case _:
-                pass
+        type_int = incoming_message.type_int
+        if type_int == SocketDataType.NONE:
+            return False
+
+        # Unknown message types are ignored, just like the ones we don't handle
+        if type_int >= len(self._dispatch_table):
+            return True
+
+        dispatch = self._dispatch_table[type_int]
+        if dispatch is not None:
+            unpack, handlers = dispatch
+            # Only unpack the flatbuffer if someone is interested in it
+            if handlers:
+                message = unpack(incoming_message.data)
+                for handler in handlers:
+                    handler(message)
 
         return True
 
@@ -343,15 +588,8 @@ class SocketRelay:
             return
 
         self.send_bytes(bytes([1]), SocketDataType.NONE)
-        timeout = 5.0
-        while self._running and timeout > 0:
-            time.sleep(0.1)
-            timeout -= 0.1
-        if timeout <= 0:
+        if not self._stopped.wait(5.0):
             self.logger.critical("RLBot is not responding to our disconnect request!?")
             self._running = False
 
-        assert (
-            not self._running
-        ), "Disconnect request or timeout should have set self._running to False"
         self.is_connected = False
@@ -8,6 +8,12 @@ from rlbot.managers.rendering import Renderer
 from rlbot.utils import fill_desired_game_state
 from rlbot.utils.logging import DEFAULT_LOGGER, get_logger
 
+# Bits of `_received`, one for each message needed before initializing
+_MATCH_SETTINGS = 1
+_FIELD_INFO = 2
+_PLAYER_MAPPING = 4
+_READY = _MATCH_SETTINGS | _FIELD_INFO | _PLAYER_MAPPING
+
 
 class Bot:
     """
@@ -18,37 +24,48 @@ class Bot:
     in `initialize` as their values are not ready in the constructor.
     """
 
-    logger = DEFAULT_LOGGER
+    __slots__ = (
+        "logger",
+        "team",
+        "index",
+        "name",
+        "spawn_id",
+        "match_settings",
+        "field_info",
+        "_initialized_bot",
+        "_received",
+        "_latest_packet",
+        "_latest_prediction",
+        "_rlbot_server_ip",
+        "_rlbot_server_port",
+        "_game_interface",
+        "renderer",
+    )
 
-    team: int = -1
-    index: int = -1
-    name: str = ""
-    spawn_id: int = 0
+    def __init__(self, default_agent_id: Optional[str] = None):
+        self.logger = DEFAULT_LOGGER
 
-    match_settings = flat.MatchSettings()
-    """
-    Contains info about what map you're on, game mode, mutators, etc.
-    """
+        self.team: int = -1
+        self.index: int = -1
+        self.name: str = ""
+        self.spawn_id: int = 0
 
-    field_info = flat.FieldInfo()
-    """
-    Contains info about the map, such as the locations of boost pads and goals.
-    """
+        self.match_settings = flat.MatchSettings()
+        """
+        Contains info about what map you're on, game mode, mutators, etc.
+        """
 
-    ball_prediction = flat.BallPrediction()
-    """
-    A simulated prediction of the ball's trajectory including collisions with field geometry (but not cars).
-    """
+        self.field_info = flat.FieldInfo()
+        """
+        Contains info about the map, such as the locations of boost pads and goals.
+        """
 
-    _initialized_bot = False
-    _has_match_settings = False
-    _has_field_info = False
-    _has_player_mapping = False
+        self._initialized_bot = False
+        self._received = 0
 
-    _latest_packet: Optional[flat.GamePacket] = None
-    _latest_prediction = flat.BallPrediction()
+        self._latest_packet: Optional[flat.GamePacket] = None
+        self._latest_prediction = flat.BallPrediction()
 
-    def __init__(self, default_agent_id: Optional[str] = None):
         agent_id = os.environ.get("RLBOT_AGENT_ID") or default_agent_id
 
         if agent_id is None:
@@ -59,15 +76,15 @@ class Bot:
             )
             exit(1)
 
+        # Read together with the agent id, the environment is set up before the process starts
+        self._rlbot_server_ip = os.environ.get("RLBOT_SERVER_IP", RLBOT_SERVER_IP)
+        self._rlbot_server_port = int(
+            os.environ.get("RLBOT_SERVER_PORT", RLBOT_SERVER_PORT)
+        )
+
         self._game_interface = SocketRelay(agent_id, logger=self.logger)
         self._game_interface.match_settings_handlers.append(self._handle_match_settings)
         self._game_interface.field_info_handlers.append(self._handle_field_info)
-        self._game_interface.match_communication_handlers.append(
-            self._handle_match_communication
-        )
-        self._game_interface.ball_prediction_handlers.append(
-            self._handle_ball_prediction
-        )
         self._game_interface.controllable_team_info_handlers.append(
             self._handle_controllable_team_info
         )
@@ -75,13 +92,15 @@ class Bot:
 
         self.renderer = Renderer(self._game_interface)
 
+    @property
+    def ball_prediction(self) -> flat.BallPrediction:
+        """
+        A simulated prediction of the ball's trajectory including collisions with field geometry (but not cars).
+        """
+        return self._latest_prediction
+
     def _try_initialize(self):
-        if (
-            self._initialized_bot
-            or not self._has_match_settings
-            or not self._has_field_info
-            or not self._has_player_mapping
-        ):
+        if self._initialized_bot or self._received != _READY:
             # Not ready to initialize
             return
 
@@ -106,12 +125,12 @@ class Bot:
 
     def _handle_match_settings(self, match_settings: flat.MatchSettings):
         self.match_settings = match_settings
-        self._has_match_settings = True
+        self._received |= _MATCH_SETTINGS
         self._try_initialize()
 
     def _handle_field_info(self, field_info: flat.FieldInfo):
         self.field_info = field_info
-        self._has_field_info = True
+        self._received |= _FIELD_INFO
         self._try_initialize()
 
     def _handle_controllable_team_info(
@@ -121,7 +140,7 @@ class Bot:
         controllable = player_mappings.controllables[0]
         self.spawn_id = controllable.spawn_id
         self.index = controllable.index
-        self._has_player_mapping = True
+        self._received |= _PLAYER_MAPPING
 
         self._try_initialize()
 
@@ -129,14 +148,14 @@ class Bot:
         self._latest_prediction = ball_prediction
 
     def _handle_packet(self, packet: flat.GamePacket):
-        self._latest_packet = packet
+        # Packets are of no use until initialization has finished
+        if self._initialized_bot:
+            self._latest_packet = packet
 
     def _packet_processor(self, packet: flat.GamePacket):
         if len(packet.players) <= self.index:
             return
 
-        self.ball_prediction = self._latest_prediction
-
         try:
             controller = self.get_output(packet)
         except Exception as e:
@@ -161,27 +180,45 @@ class Bot:
         Runs the bot. This operation is blocking until the match ends.
         """
 
-        rlbot_server_ip = os.environ.get("RLBOT_SERVER_IP", RLBOT_SERVER_IP)
-        rlbot_server_port = int(os.environ.get("RLBOT_SERVER_PORT", RLBOT_SERVER_PORT))
+        # Streams that weren't asked for don't need handlers, so they are never unpacked
+        if wants_ball_predictions:
+            self._game_interface.ball_prediction_handlers.append(
+                self._handle_ball_prediction
+            )
+        # Match comms aren't unpacked at all if the bot doesn't handle them
+        if (
+            wants_match_communications
+            and type(self).handle_match_comm is not Bot.handle_match_comm
+        ):
+            self._game_interface.match_communication_handlers.append(
+                self._handle_match_communication
+            )
 
         try:
             self._game_interface.connect(
                 wants_match_communications=wants_match_communications,
                 wants_ball_predictions=wants_ball_predictions,
-                rlbot_server_ip=rlbot_server_ip,
-                rlbot_server_port=rlbot_server_port,
+                rlbot_server_ip=self._rlbot_server_ip,
+                rlbot_server_port=self._rlbot_server_port,
             )
 
+            # Looked up once instead of on every tick
+            handle_incoming_messages = self._game_interface.handle_incoming_messages
+            batch = self._game_interface.batch
+            packet_processor = self._packet_processor
+
             running = True
             while running:
                 # Whenever we receive one or more game packets,
                 # we want to process the latest one.
-                running = self._game_interface.handle_incoming_messages(
-                    blocking=self._latest_packet is None
-                )
-                if self._latest_packet is not None and running:
-                    self._packet_processor(self._latest_packet)
-                    self._latest_packet = None
+                running = handle_incoming_messages(blocking=self._latest_packet is None)
+                # Cleared before processing, so that a packet stored while
+                # this one is being processed isn't cleared along with it
+                packet, self._latest_packet = self._latest_packet, None
+                if packet is not None and running:
+                    # Everything sent while processing the packet goes out in one write
+                    with batch():
+                        packet_processor(packet)
         except Exception as e:
             self.logger.error("Unexpected error: %s", e)
         finally:
@@ -233,10 +270,10 @@ class Bot:
 
     def set_game_state(
         self,
-        balls: dict[int, flat.DesiredBallState] = {},
-        cars: dict[int, flat.DesiredCarState] = {},
+        balls: Optional[dict[int, flat.DesiredBallState]] = None,
+        cars: Optional[dict[int, flat.DesiredCarState]] = None,
         game_info: Optional[flat.DesiredGameInfoState] = None,
-        commands: list[flat.ConsoleCommand] = [],
+        commands: Optional[list[flat.ConsoleCommand]] = None,
     ):
         """
         Sets the game to the desired state.
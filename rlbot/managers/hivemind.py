@@ -9,6 +9,12 @@ from rlbot.managers import Renderer
 from rlbot.utils import fill_desired_game_state
 from rlbot.utils.logging import DEFAULT_LOGGER, get_logger
 
+# Bits of `_received`, one for each message needed before initializing
+_MATCH_SETTINGS = 1
+_FIELD_INFO = 2
+_PLAYER_MAPPING = 4
+_READY = _MATCH_SETTINGS | _FIELD_INFO | _PLAYER_MAPPING
+
 
 class Hivemind:
     """
@@ -19,38 +25,51 @@ class Hivemind:
     `initialize` as their values are not ready in the constructor.
     """
 
-    _logger = DEFAULT_LOGGER
-    loggers: list[Logger] = []
+    __slots__ = (
+        "_logger",
+        "loggers",
+        "team",
+        "indices",
+        "names",
+        "spawn_ids",
+        "match_settings",
+        "field_info",
+        "_initialized_bot",
+        "_received",
+        "_latest_packet",
+        "_latest_prediction",
+        "_rlbot_server_ip",
+        "_rlbot_server_port",
+        "_game_interface",
+        "renderer",
+    )
 
-    team: int = -1
-    indices: list[int] = []
-    names: list[str] = []
-    spawn_ids: list[int] = []
+    def __init__(self, default_agent_id: Optional[str] = None):
+        self._logger = DEFAULT_LOGGER
+        # Each hivemind needs its own `names` and `loggers` lists, they are filled in place during initialization
+        self.loggers: list[Logger] = []
 
-    match_settings = flat.MatchSettings()
-    """
-    Contains info about what map you're on, game mode, mutators, etc.
-    """
+        self.team: int = -1
+        self.indices: tuple[int, ...] = ()
+        self.names: list[str] = []
+        self.spawn_ids: tuple[int, ...] = ()
 
-    field_info = flat.FieldInfo()
-    """
-    Contains info about the map, such as the locations of boost pads and goals.
-    """
+        self.match_settings = flat.MatchSettings()
+        """
+        Contains info about what map you're on, game mode, mutators, etc.
+        """
 
-    ball_prediction = flat.BallPrediction()
-    """
-    A simulated prediction of the ball's trajectory including collisions with field geometry (but not cars).
-    """
+        self.field_info = flat.FieldInfo()
+        """
+        Contains info about the map, such as the locations of boost pads and goals.
+        """
 
-    _initialized_bot = False
-    _has_match_settings = False
-    _has_field_info = False
-    _has_player_mapping = False
+        self._initialized_bot = False
+        self._received = 0
 
-    _latest_packet: Optional[flat.GamePacket] = None
-    _latest_prediction = flat.BallPrediction()
+        self._latest_packet: Optional[flat.GamePacket] = None
+        self._latest_prediction = flat.BallPrediction()
 
-    def __init__(self, default_agent_id: Optional[str] = None):
         agent_id = os.environ.get("RLBOT_AGENT_ID") or default_agent_id
 
         if agent_id is None:
@@ -61,15 +80,15 @@ class Hivemind:
             )
             exit(1)
 
+        # Read together with the agent id, the environment is set up before the process starts
+        self._rlbot_server_ip = os.environ.get("RLBOT_SERVER_IP", RLBOT_SERVER_IP)
+        self._rlbot_server_port = int(
+            os.environ.get("RLBOT_SERVER_PORT", RLBOT_SERVER_PORT)
+        )
+
         self._game_interface = SocketRelay(agent_id, logger=self._logger)
         self._game_interface.match_settings_handlers.append(self._handle_match_settings)
         self._game_interface.field_info_handlers.append(self._handle_field_info)
-        self._game_interface.match_communication_handlers.append(
-            self._handle_match_communication
-        )
-        self._game_interface.ball_prediction_handlers.append(
-            self._handle_ball_prediction
-        )
         self._game_interface.controllable_team_info_handlers.append(
             self._handle_controllable_team_info
         )
@@ -77,22 +96,27 @@ class Hivemind:
 
         self.renderer = Renderer(self._game_interface)
 
+    @property
+    def ball_prediction(self) -> flat.BallPrediction:
+        """
+        A simulated prediction of the ball's trajectory including collisions with field geometry (but not cars).
+        """
+        return self._latest_prediction
+
     def _try_initialize(self):
-        if (
-            self._initialized_bot
-            or not self._has_match_settings
-            or not self._has_field_info
-            or not self._has_player_mapping
-        ):
+        if self._initialized_bot or self._received != _READY:
             return
 
-        # Search match settings for our spawn ids
+        # Look up our spawn ids in the match settings
+        players = {
+            player.spawn_id: player
+            for player in self.match_settings.player_configurations
+        }
         for spawn_id in self.spawn_ids:
-            for player in self.match_settings.player_configurations:
-                if player.spawn_id == spawn_id:
-                    self.names.append(player.name)
-                    self.loggers.append(get_logger(player.name))
-                    break
+            player = players.get(spawn_id)
+            if player is not None:
+                self.names.append(player.name)
+                self.loggers.append(get_logger(player.name))
 
         try:
             self.initialize()
@@ -110,37 +134,38 @@ class Hivemind:
 
     def _handle_match_settings(self, match_settings: flat.MatchSettings):
         self.match_settings = match_settings
-        self._has_match_settings = True
+        self._received |= _MATCH_SETTINGS
         self._try_initialize()
 
     def _handle_field_info(self, field_info: flat.FieldInfo):
         self.field_info = field_info
-        self._has_field_info = True
+        self._received |= _FIELD_INFO
         self._try_initialize()
 
     def _handle_controllable_team_info(
         self, player_mappings: flat.ControllableTeamInfo
     ):
         self.team = player_mappings.team
-        for controllable in player_mappings.controllables:
-            self.spawn_ids.append(controllable.spawn_id)
-            self.indices.append(controllable.index)
+        # The controlled bots don't change during a match, so they are stored in tuples
+        controllables = player_mappings.controllables
+        self.spawn_ids = tuple(controllable.spawn_id for controllable in controllables)
+        self.indices = tuple(controllable.index for controllable in controllables)
 
-        self._has_player_mapping = True
+        self._received |= _PLAYER_MAPPING
         self._try_initialize()
 
     def _handle_ball_prediction(self, ball_prediction: flat.BallPrediction):
         self._latest_prediction = ball_prediction
 
     def _handle_packet(self, packet: flat.GamePacket):
-        self._latest_packet = packet
+        # Packets are of no use until initialization has finished
+        if self._initialized_bot:
+            self._latest_packet = packet
 
     def _packet_processor(self, packet: flat.GamePacket):
         if len(packet.players) <= self.indices[-1]:
             return
 
-        self.ball_prediction = self._latest_prediction
-
         try:
             controller = self.get_outputs(packet)
         except Exception as e:
@@ -152,6 +177,7 @@ class Hivemind:
             print_exc()
             return
 
+        send_player_input = self._game_interface.send_player_input
         for index, controller in controller.items():
             if index not in self.indices:
                 self._logger.warning(
@@ -161,7 +187,7 @@ class Hivemind:
                     ", ".join(map(str, self.indices)),
                 )
             player_input = flat.PlayerInput(index, controller)
-            self._game_interface.send_player_input(player_input)
+            send_player_input(player_input)
 
     def run(
         self,
@@ -173,27 +199,46 @@ class Hivemind:
         Runs the bot. This operation is blocking until the match ends.
         """
 
-        rlbot_server_ip = os.environ.get("RLBOT_SERVER_IP", RLBOT_SERVER_IP)
-        rlbot_server_port = int(os.environ.get("RLBOT_SERVER_PORT", RLBOT_SERVER_PORT))
+        # Streams that weren't asked for don't need handlers, so they are never unpacked
+        if wants_ball_predictions:
+            self._game_interface.ball_prediction_handlers.append(
+                self._handle_ball_prediction
+            )
+        # Match comms aren't unpacked at all if the hivemind doesn't handle them
+        if (
+            wants_match_communications
+            and type(self).handle_match_comm is not Hivemind.handle_match_comm
+        ):
+            self._game_interface.match_communication_handlers.append(
+                self._handle_match_communication
+            )
 
         try:
             self._game_interface.connect(
                 wants_match_communications=wants_match_communications,
                 wants_ball_predictions=wants_ball_predictions,
-                rlbot_server_ip=rlbot_server_ip,
-                rlbot_server_port=rlbot_server_port,
+                rlbot_server_ip=self._rlbot_server_ip,
+                rlbot_server_port=self._rlbot_server_port,
             )
 
+            # Looked up once instead of on every tick
+            handle_incoming_messages = self._game_interface.handle_incoming_messages
+            batch = self._game_interface.batch
+            packet_processor = self._packet_processor
+
             running = True
             while running:
                 # Whenever we receive one or more game packets,
                 # we want to process the latest one.
-                running = self._game_interface.handle_incoming_messages(
-                    blocking=self._latest_packet is None
-                )
-                if self._latest_packet is not None and running:
-                    self._packet_processor(self._latest_packet)
-                    self._latest_packet = None
+                running = handle_incoming_messages(blocking=self._latest_packet is None)
+                # Cleared before processing, so that a packet stored while
+                # this one is being processed isn't cleared along with it
+                packet, self._latest_packet = self._latest_packet, None
+                if packet is not None and running:
+                    # The inputs of all bots (and anything else sent while processing
+                    # the packet) go out in one write
+                    with batch():
+                        packet_processor(packet)
         finally:
             self.retire()
             del self._game_interface
@@ -247,10 +292,10 @@ class Hivemind:
 
     def set_game_state(
         self,
-        balls: dict[int, flat.DesiredBallState] = {},
-        cars: dict[int, flat.DesiredCarState] = {},
+        balls: Optional[dict[int, flat.DesiredBallState]] = None,
+        cars: Optional[dict[int, flat.DesiredCarState]] = None,
         game_info: Optional[flat.DesiredGameInfoState] = None,
-        commands: list[flat.ConsoleCommand] = [],
+        commands: Optional[list[flat.ConsoleCommand]] = None,
     ):
         """
         Sets the game to the desired state.
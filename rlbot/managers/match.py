@@ -1,4 +1,6 @@
+import os
 import tomllib
+from functools import lru_cache
 from pathlib import Path
 from time import sleep
 from typing import Any, Optional
@@ -11,6 +13,25 @@ from rlbot.utils import fill_desired_game_state, gateway
 from rlbot.utils.logging import DEFAULT_LOGGER
 from rlbot.utils.os_detector import CURRENT_OS, MAIN_EXECUTABLE_NAME, OS
 
+_IS_LINUX = CURRENT_OS == OS.LINUX
+
+
+@lru_cache(maxsize=64)
+def _parse_toml(path: str, mtime_ns: int) -> dict[str, Any]:
+    # Same as `tomllib.load`, which also reads the whole file and decodes the bytes as-is,
+    # so line endings in multi-line strings are left untouched.
+    return tomllib.loads(Path(path).read_bytes().decode())
+
+
+def _load_toml(path: Path | str) -> dict[str, Any]:
+    """
+    Reads the toml file at the provided path.
+    Files that haven't been modified since they were last read are not parsed again,
+    so the returned dictionary is shared and must not be mutated.
+    """
+    path = os.path.abspath(path)
+    return _parse_toml(path, os.stat(path).st_mtime_ns)
+
 
 def extract_loadout_paint(config: dict[str, Any]) -> flat.LoadoutPaint:
     """
@@ -28,12 +49,11 @@ def extract_loadout_paint(config: dict[str, Any]) -> flat.LoadoutPaint:
     )
 
 
-def get_player_loadout(path: str, team: int) -> flat.PlayerLoadout:
+def get_player_loadout(path: Path | str, team: int) -> flat.PlayerLoadout:
     """
     Reads the loadout toml file at the provided path and extracts the `PlayerLoadout` for the given team.
     """
-    with open(path, "rb") as f:
-        config = tomllib.load(f)
+    config = _load_toml(path)
 
     loadout = config["blue_loadout"] if team == 0 else config["orange_loadout"]
     paint = loadout.get("paint", None)
@@ -63,8 +83,7 @@ def get_player_config(
     Reads the bot toml file at the provided path and
     creates a `PlayerConfiguration` of the given type for the given team.
     """
-    with open(path, "rb") as f:
-        config = tomllib.load(f)
+    config = _load_toml(path)
 
     match path:
         case Path():
@@ -79,18 +98,18 @@ def get_player_config(
         root_dir /= settings["root_dir"]
 
     run_command = settings.get("run_command", "")
-    if CURRENT_OS == OS.LINUX and "run_command_linux" in settings:
+    if _IS_LINUX and "run_command_linux" in settings:
         run_command = settings["run_command_linux"]
 
+    loadout = None
     loadout_path = settings.get("loadout_file", None)
     if loadout_path is not None:
-        loadout_path = parent / loadout_path
-
-    loadout = (
-        get_player_loadout(loadout_path, team)
-        if loadout_path is not None and loadout_path.exists()
-        else None
-    )
+        # The loadout file is stat'ed by `_load_toml` anyway,
+        # so a missing file is handled there instead of checking beforehand
+        try:
+            loadout = get_player_loadout(parent / loadout_path, team)
+        except FileNotFoundError:
+            pass
 
     return flat.PlayerConfiguration(
         type,
@@ -109,8 +128,7 @@ def get_script_config(path: Path | str) -> flat.ScriptConfiguration:
     """
     Reads the script toml file at the provided path and creates a `ScriptConfiguration` from it.
     """
-    with open(path, "rb") as f:
-        config = tomllib.load(f)
+    config = _load_toml(path)
 
     match path:
         case Path():
@@ -125,7 +143,7 @@ def get_script_config(path: Path | str) -> flat.ScriptConfiguration:
         root_dir /= settings["root_dir"]
 
     run_command = settings.get("run_command", "")
-    if CURRENT_OS == OS.LINUX and "run_command_linux" in settings:
+    if _IS_LINUX and "run_command_linux" in settings:
         run_command = settings["run_command_linux"]
 
     return flat.ScriptConfiguration(
@@ -266,10 +284,10 @@ class MatchManager:
 
     def set_game_state(
         self,
-        balls: dict[int, flat.DesiredBallState] = {},
-        cars: dict[int, flat.DesiredCarState] = {},
+        balls: Optional[dict[int, flat.DesiredBallState]] = None,
+        cars: Optional[dict[int, flat.DesiredCarState]] = None,
         game_info: Optional[flat.DesiredGameInfoState] = None,
-        commands: list[flat.ConsoleCommand] = [],
+        commands: Optional[list[flat.ConsoleCommand]] = None,
     ):
         """
         Sets the game to the desired state.
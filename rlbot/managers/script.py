@@ -8,6 +8,11 @@ from rlbot.managers import Renderer
 from rlbot.utils import fill_desired_game_state
 from rlbot.utils.logging import DEFAULT_LOGGER, get_logger
 
+# Bits of `_received`, one for each message needed before initializing
+_MATCH_SETTINGS = 1
+_FIELD_INFO = 2
+_READY = _MATCH_SETTINGS | _FIELD_INFO
+
 
 class Script:
     """
@@ -24,11 +29,9 @@ class Script:
 
     match_settings = flat.MatchSettings()
     field_info = flat.FieldInfo()
-    ball_prediction = flat.BallPrediction()
 
     _initialized_script = False
-    _has_match_settings = False
-    _has_field_info = False
+    _received = 0
 
     _latest_packet: Optional[flat.GamePacket] = None
     _latest_prediction = flat.BallPrediction()
@@ -44,25 +47,28 @@ class Script:
             )
             exit(1)
 
+        # Read together with the agent id, the environment is set up before the process starts
+        self._rlbot_server_ip = os.environ.get("RLBOT_SERVER_IP", RLBOT_SERVER_IP)
+        self._rlbot_server_port = int(
+            os.environ.get("RLBOT_SERVER_PORT", RLBOT_SERVER_PORT)
+        )
+
         self._game_interface = SocketRelay(agent_id, logger=self.logger)
         self._game_interface.match_settings_handlers.append(self._handle_match_settings)
         self._game_interface.field_info_handlers.append(self._handle_field_info)
-        self._game_interface.match_communication_handlers.append(
-            self._handle_match_communication
-        )
-        self._game_interface.ball_prediction_handlers.append(
-            self._handle_ball_prediction
-        )
         self._game_interface.packet_handlers.append(self._handle_packet)
 
         self.renderer = Renderer(self._game_interface)
 
+    @property
+    def ball_prediction(self) -> flat.BallPrediction:
+        """
+        A simulated prediction of the ball's trajectory including collisions with field geometry (but not cars).
+        """
+        return self._latest_prediction
+
     def _try_initialize(self):
-        if (
-            self._initialized_script
-            or not self._has_match_settings
-            or not self._has_field_info
-        ):
+        if self._initialized_script or self._received != _READY:
             return
 
         self.logger = get_logger(self.name)
@@ -88,7 +94,7 @@ class Script:
             if script.agent_id == self._game_interface.agent_id:
                 self.index = i
                 self.name = script.name
-                self._has_match_settings = True
+                self._received |= _MATCH_SETTINGS
                 break
         else:  # else block runs if break was not hit
             self.logger.warning(
@@ -100,7 +106,7 @@ class Script:
 
     def _handle_field_info(self, field_info: flat.FieldInfo):
         self.field_info = field_info
-        self._has_field_info = True
+        self._received |= _FIELD_INFO
         self._try_initialize()
 
     def _handle_ball_prediction(self, ball_prediction: flat.BallPrediction):
@@ -110,8 +116,6 @@ class Script:
         self._latest_packet = packet
 
     def _packet_processor(self, packet: flat.GamePacket):
-        self.ball_prediction = self._latest_prediction
-
         try:
             self.handle_packet(packet)
         except Exception as e:
@@ -130,27 +134,45 @@ class Script:
         Runs the script. This operation is blocking until the match ends.
         """
 
-        rlbot_server_ip = os.environ.get("RLBOT_SERVER_IP", RLBOT_SERVER_IP)
-        rlbot_server_port = int(os.environ.get("RLBOT_SERVER_PORT", RLBOT_SERVER_PORT))
+        # Streams that weren't asked for don't need handlers, so they are never unpacked
+        if wants_ball_predictions:
+            self._game_interface.ball_prediction_handlers.append(
+                self._handle_ball_prediction
+            )
+        # Match comms aren't unpacked at all if the script doesn't handle them
+        if (
+            wants_match_communications
+            and type(self).handle_match_comm is not Script.handle_match_comm
+        ):
+            self._game_interface.match_communication_handlers.append(
+                self._handle_match_communication
+            )
 
         try:
             self._game_interface.connect(
                 wants_match_communications=wants_match_communications,
                 wants_ball_predictions=wants_ball_predictions,
-                rlbot_server_ip=rlbot_server_ip,
-                rlbot_server_port=rlbot_server_port,
+                rlbot_server_ip=self._rlbot_server_ip,
+                rlbot_server_port=self._rlbot_server_port,
             )
 
+            # Looked up once instead of on every tick
+            handle_incoming_messages = self._game_interface.handle_incoming_messages
+            batch = self._game_interface.batch
+            packet_processor = self._packet_processor
+
             running = True
             while running:
                 # Whenever we receive one or more game packets,
                 # we want to process the latest one.
-                running = self._game_interface.handle_incoming_messages(
-                    blocking=self._latest_packet is None
-                )
-                if self._latest_packet is not None and running:
-                    self._packet_processor(self._latest_packet)
-                    self._latest_packet = None
+                running = handle_incoming_messages(blocking=self._latest_packet is None)
+                # Cleared before processing, so that a packet stored while
+                # this one is being processed isn't cleared along with it
+                packet, self._latest_packet = self._latest_packet, None
+                if packet is not None and running:
+                    # Everything sent while processing the packet goes out in one write
+                    with batch():
+                        packet_processor(packet)
         finally:
             self.retire()
             del self._game_interface
@@ -200,10 +222,10 @@ class Script:
 
     def set_game_state(
         self,
-        balls: dict[int, flat.DesiredBallState] = {},
-        cars: dict[int, flat.DesiredCarState] = {},
+        balls: Optional[dict[int, flat.DesiredBallState]] = None,
+        cars: Optional[dict[int, flat.DesiredCarState]] = None,
         game_info: Optional[flat.DesiredGameInfoState] = None,
-        commands: list[flat.ConsoleCommand] = [],
+        commands: Optional[list[flat.ConsoleCommand]] = None,
     ):
         """
         Sets the game to the desired state.
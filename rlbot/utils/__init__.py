@@ -4,10 +4,10 @@ from rlbot import flat
 
 
 def fill_desired_game_state(
-    balls: dict[int, flat.DesiredBallState] = {},
-    cars: dict[int, flat.DesiredCarState] = {},
+    balls: Optional[dict[int, flat.DesiredBallState]] = None,
+    cars: Optional[dict[int, flat.DesiredCarState]] = None,
     game_info: Optional[flat.DesiredGameInfoState] = None,
-    commands: list[flat.ConsoleCommand] = [],
+    commands: Optional[list[flat.ConsoleCommand]] = None,
 ) -> flat.DesiredGameState:
     """
     # Converts the dictionaries to a DesiredGameState by
@@ -15,19 +15,22 @@ def fill_desired_game_state(
     """
 
     game_state = flat.DesiredGameState(
-        game_info_state=game_info, console_commands=commands
+        game_info_state=game_info,
+        console_commands=commands if commands is not None else [],
     )
 
     if balls:
         max_entry = max(balls.keys())
         game_state.ball_states = [
-            balls.get(i, flat.DesiredBallState()) for i in range(max_entry + 1)
+            balls[i] if i in balls else flat.DesiredBallState()
+            for i in range(max_entry + 1)
         ]
 
     if cars:
         max_entry = max(cars.keys())
         game_state.car_states = [
-            cars.get(i, flat.DesiredCarState()) for i in range(max_entry + 1)
+            cars[i] if i in cars else flat.DesiredCarState()
+            for i in range(max_entry + 1)
         ]
 
     return game_state